@@ -9,6 +9,58 @@ const API_BASE_URL = import.meta.env.DEV
 // Global reference to current audio for stopping
 let currentAudio = null;
 
+// Registered graph handles keyed by the nodes array they were built from
+// (graphId is null when registration failed, so we don't retry every question)
+const graphHandles = new WeakMap();
+
+// Set once the backend reports it can't store graphs (503), skip registering after that
+let graphRegistrationUnsupported = false;
+
+/**
+ * Register the repository graph once and get a compact handle for later questions
+ * @param {string} repoUrl - The repository URL
+ * @param {Array} nodes - Repository nodes
+ * @param {Array} edges - Repository edges
+ * @returns {Promise<string|null>} The graph handle, or null if the backend can't store graphs
+ */
+async function registerGraph(repoUrl, nodes, edges) {
+  if (graphRegistrationUnsupported) {
+    return null;
+  }
+
+  const cached = graphHandles.get(nodes);
+  if (cached && cached.repoUrl === repoUrl && cached.edges === edges) {
+    return cached.graphId;
+  }
+
+  const response = await fetch(`${API_BASE_URL}/register-graph`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({
+      repoUrl,
+      nodes,
+      edges,
+    }),
+  });
+
+  if (!response.ok) {
+    console.warn('⚠️ Graph registration unavailable, sending nodes/edges inline');
+    if (response.status === 503) {
+      graphRegistrationUnsupported = true;
+    } else {
+      graphHandles.set(nodes, { repoUrl, edges, graphId: null });
+    }
+    return null;
+  }
+
+  const { graphId } = await response.json();
+  graphHandles.set(nodes, { repoUrl, edges, graphId });
+  console.log('🗂️ Registered repository graph:', graphId);
+  return graphId;
+}
+
 /**
  * Ask a question about the codebase
  * @param {string} question - The user's question
@@ -23,18 +75,26 @@ export async function askCodebase(question, repoUrl, nodes, edges) {
     console.log('📡 API URL:', `${API_BASE_URL}/ask-codebase`);
     console.log('❓ Question:', question);
     
-    const response = await fetch(`${API_BASE_URL}/ask-codebase`, {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify({
-        question,
-        repoUrl,
-        nodes,
-        edges,
-      }),
-    });
+    const send = async () => {
+      const graphId = await registerGraph(repoUrl, nodes, edges);
+      return fetch(`${API_BASE_URL}/ask-codebase`, {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+        },
+        // Only send the short handle once the graph is registered
+        body: JSON.stringify(
+          graphId ? { question, graphId } : { question, repoUrl, nodes, edges }
+        ),
+      });
+    };
+
+    let response = await send();
+    if (response.status === 404) {
+      // Handle expired on the server, register the graph again
+      graphHandles.delete(nodes);
+      response = await send();
+    }
 
     console.log('📊 Response status:', response.status);
 
@@ -70,6 +130,7 @@ export async function speakText(text) {
       },
       body: JSON.stringify({
         text: text,
+        raw: true, // Raw audio/mpeg avoids the base64 overhead
       }),
     });
 
@@ -78,17 +139,9 @@ export async function speakText(text) {
       throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
     }
 
-    const result = await response.json();
+    const audioBlob = await response.blob();
     console.log('✅ ElevenLabs voice synthesis completed');
     
-    // Convert base64 audio to blob and play
-    const audioBytes = atob(result.audio_base64);
-    const audioArray = new Uint8Array(audioBytes.length);
-    for (let i = 0; i < audioBytes.length; i++) {
-      audioArray[i] = audioBytes.charCodeAt(i);
-    }
-    
-    const audioBlob = new Blob([audioArray], { type: 'audio/mpeg' });
     const audioUrl = URL.createObjectURL(audioBlob);
     
     return new Promise((resolve, reject) => {
@@ -6,6 +6,9 @@ const API_BASE_URL = import.meta.env.DEV
   ? "http://localhost:8000"
   : "https://shellhacks25-backend.vercel.app"; // Update this to match your backend URL
 
+// Previously fetched summaries keyed by file path, revalidated with ETags
+const summaryCache = new Map();
+
 /**
  * Summarize a file using the backend API
  * @param {string} filePath - The GitHub file path (e.g., "owner/repo/branch/path/to/file.js")
@@ -19,21 +22,34 @@ export async function summarizeFile(filePath, fileName, fileType) {
     console.log('📡 API URL:', `${API_BASE_URL}/summarize-file`);
     console.log('📋 Request payload:', { filePath, fileName, fileType });
     
+    const cached = summaryCache.get(filePath);
+    const headers = {
+      "Content-Type": "application/json",
+    };
+    if (cached?.etag) {
+      headers["If-None-Match"] = cached.etag;
+    }
+
     const response = await fetch(`${API_BASE_URL}/summarize-file`, {
       method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
+      headers,
       body: JSON.stringify({
         filePath,
         fileName,
         fileType,
+        // Let the server skip resending content we already have
+        knownContentHash: cached?.result.contentHash,
       }),
     });
 
     console.log('📊 Response status:', response.status);
     console.log('📊 Response ok:', response.ok);
 
+    if (response.status === 304 && cached) {
+      console.log('✅ Summary not modified, using cached result');
+      return cached.result;
+    }
+
     if (!response.ok) {
       console.error('❌ Response not OK, attempting to parse error...');
       const errorData = await response.json();
@@ -43,6 +59,10 @@ export async function summarizeFile(filePath, fileName, fileType) {
 
     console.log('✅ Response OK, parsing JSON...');
     const result = await response.json();
+    if (result.fileContent == null && cached?.result.contentHash === result.contentHash) {
+      result.fileContent = cached.result.fileContent;
+    }
+    summaryCache.set(filePath, { etag: response.headers.get("ETag"), result });
     console.log('✅ Parsed result:', result);
     return result;
   } catch (error) {
@@ -1,13 +1,21 @@
 import google.generativeai as genai
 import openai
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import requests
 import os
 from typing import Optional
 import io
 import base64
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from cache import SharedCache
+from compression import CompressionMiddleware
+from graph import RepoGraph, loads as decode_json
 
 # Load environment variables from .env file
 try:
@@ -33,8 +41,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Content-Range", "Accept-Ranges"],
 )
 
+# Compress large JSON/text bodies (file contents, summaries, base64 audio)
+# Uses brotli when installed, otherwise gzip
+app.add_middleware(CompressionMiddleware, minimum_size=1000)
+
 # Configure Gemini API
 api_key = os.getenv("GEMINI_API_KEY")
 print(f"🔑 GEMINI_API_KEY loaded: {'✅ Yes' if api_key else '❌ No'}")
@@ -68,6 +81,21 @@ if elevenlabs_api_key:
 else:
     print("❌ ELEVENLABS_API_KEY not found in environment variables")
 
+# Shared cache so every worker process reuses fetched files, LLM answers and TTS clips
+# Upstream calls run while holding the cache lock, so they must never hang indefinitely
+UPSTREAM_TIMEOUT = int(os.getenv("UPSTREAM_TIMEOUT", 60))
+shared_cache = SharedCache(lock_timeout=UPSTREAM_TIMEOUT)
+FILE_CACHE_TTL = int(os.getenv("FILE_CACHE_TTL", 600))  # GitHub content can change, keep it short
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 86400))
+TTS_CACHE_TTL = int(os.getenv("TTS_CACHE_TTL", 604800))
+GRAPH_CACHE_TTL = int(os.getenv("GRAPH_CACHE_TTL", 86400))
+
+# Decoded graphs recently used by this worker. Graph ids are content hashes,
+# so an entry never goes stale and questions skip re-reading/decoding the blob.
+GRAPH_LRU_SIZE = int(os.getenv("GRAPH_LRU_SIZE", 16))
+decoded_graphs = OrderedDict()
+decoded_graphs_lock = threading.Lock()
+
 class InferenceBody(BaseModel):
     filePath: str
 
@@ -75,15 +103,76 @@ class FileSummaryBody(BaseModel):
     filePath: str
     fileName: str
     fileType: str
+    includeContent: bool = True  # Set to False when the client already has the file content
+    knownContentHash: Optional[str] = None  # Content is omitted if it still matches this hash
 
 class CodebaseQuestionBody(BaseModel):
     question: str
-    repoUrl: str
-    nodes: list
-    edges: list
+    repoUrl: Optional[str] = None
+    graphId: Optional[str] = None  # Handle from /register-graph, replaces nodes/edges
+    nodes: list = []
+    edges: list = []
 
 class VoiceSynthesisBody(BaseModel):
     text: str
+    raw: bool = False  # Return audio/mpeg bytes instead of base64 JSON
+
+def fetch_file(url, timeout=15):
+    """
+    Fetch a URL's body through the shared cache (raises requests.HTTPError on non-2xx)
+    """
+    def download():
+        response = requests.get(url, timeout=timeout)
+        response.raise_for_status()
+        return response.content
+    return shared_cache.get_or_compute(f"file:{url}", download, ttl=FILE_CACHE_TTL)
+
+def generate_text(prompt):
+    """
+    Run a prompt through Gemini, reusing a cached answer for identical prompts
+    """
+    key = f"gemini:{hashlib.sha256(prompt.encode('utf-8')).hexdigest()}"
+    return shared_cache.get_or_compute(
+        key,
+        lambda: model.generate_content(prompt, request_options={"timeout": UPSTREAM_TIMEOUT}).text.encode('utf-8'),
+        ttl=LLM_CACHE_TTL
+    ).decode('utf-8')
+
+def remember_graph(graph_id, graph):
+    with decoded_graphs_lock:
+        decoded_graphs[graph_id] = graph
+        decoded_graphs.move_to_end(graph_id)
+        while len(decoded_graphs) > GRAPH_LRU_SIZE:
+            decoded_graphs.popitem(last=False)
+
+def resolve_graph(body):
+    """
+    Load the repository graph for a question, either from a registered handle
+    or from nodes/edges sent inline by older clients
+    """
+    if body.graphId:
+        with decoded_graphs_lock:
+            graph = decoded_graphs.get(body.graphId)
+            if graph is not None:
+                decoded_graphs.move_to_end(body.graphId)
+                return graph
+        data = shared_cache.get(f"graph:{body.graphId}")
+        try:
+            graph = RepoGraph.from_bytes(data) if data is not None else None
+        except ValueError as e:
+            # Stored by an older server version with a different layout
+            print(f"❌ Could not decode graph {body.graphId}: {str(e)}")
+            graph = None
+        if graph is None:
+            raise HTTPException(status_code=404, detail="Unknown or expired graphId, please register the graph again")
+        remember_graph(body.graphId, graph)
+        return graph
+    if not body.repoUrl:
+        raise HTTPException(status_code=400, detail="Either graphId or repoUrl with nodes/edges is required")
+    try:
+        return RepoGraph.from_lists(body.repoUrl, body.nodes, body.edges)
+    except (AttributeError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid nodes/edges: {str(e)}")
 
 def fetch_repository_tree(owner, repo, branch):
     """
@@ -94,13 +183,12 @@ def fetch_repository_tree(owner, repo, branch):
         api_url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{branch}?recursive=1"
         
         print(f"🌳 Fetching repository tree from: {api_url}")
-        response = requests.get(api_url, timeout=15)
-        
-        if response.status_code != 200:
-            print(f"❌ GitHub API error: {response.status_code}")
+        try:
+            tree_data = json.loads(fetch_file(api_url, timeout=15))
+        except requests.HTTPError as e:
+            print(f"❌ GitHub API error: {e.response.status_code}")
             return []
         
-        tree_data = response.json()
         files = []
         
         # Extract files from tree
@@ -174,18 +262,121 @@ def get_file_priority(file_name, file_path):
     # Default priority
     return 40
 
+def content_hash(data):
+    """
+    Hash a str/bytes payload (or several joined together) for use in ETags
+    """
+    if isinstance(data, (list, tuple)):
+        data = "\0".join(data)
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+def etag_matches(request, etag):
+    """
+    Check whether the request's If-None-Match header already covers this ETag
+    """
+    if_none_match = request.headers.get('if-none-match')
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    # "*" only means "not modified" for safe methods, POST endpoints ignore it
+    if '*' in candidates and request.method in ('GET', 'HEAD'):
+        return True
+    return etag in candidates or f'W/{etag}' in candidates
+
+def not_modified(etag, cache_control):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+def cached_json_response(payload, etag, cache_control="private, max-age=300"):
+    """
+    Serialize a JSON payload with ETag and Cache-Control headers attached
+    """
+    return Response(
+        content=json.dumps(payload),
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": cache_control}
+    )
+
+UNSATISFIABLE_RANGE = object()
+
+def parse_byte_range(range_header, size):
+    """
+    Parse a single "bytes=start-end" Range header into inclusive offsets.
+    Returns None when the header should be ignored (malformed or multiple ranges),
+    or UNSATISFIABLE_RANGE when it is valid but lies outside the file.
+    """
+    if not range_header.startswith('bytes=') or ',' in range_header:
+        return None
+    start, sep, end = range_header[len('bytes='):].strip().partition('-')
+    if not sep or (start and not start.isdigit()) or (end and not end.isdigit()) or not (start or end):
+        return None
+    if start == '':
+        # Suffix range: last N bytes
+        length = int(end)
+        if length == 0 or size == 0:
+            return UNSATISFIABLE_RANGE
+        return max(size - length, 0), size - 1
+    start = int(start)
+    if end and int(end) < start:
+        return None
+    if start >= size:
+        return UNSATISFIABLE_RANGE
+    end = int(end) if end else size - 1
+    return start, min(end, size - 1)
+
 baseURL = "https://raw.githubusercontent.com/"
 
 @app.get("/")
 def read_root():
     return {"Hello": "World"}
 
+def store_graph(body_bytes):
+    payload = decode_json(body_bytes)
+    repo_url = payload.get('repoUrl')
+    if not isinstance(repo_url, str) or not repo_url.strip():
+        raise ValueError("repoUrl must be a non-empty string")
+    graph = RepoGraph.from_lists(repo_url, payload.get('nodes') or [], payload.get('edges') or [])
+    data = graph.to_bytes()
+    graph_id = RepoGraph.digest(data)
+    stored = shared_cache.set(f"graph:{graph_id}", data, ttl=GRAPH_CACHE_TTL)
+    if stored:
+        remember_graph(graph_id, graph)
+    return graph_id, graph, stored
+
+@app.post("/register-graph")
+async def register_graph(request: Request):
+    """
+    Store a repository graph server-side and return a compact handle
+    that /ask-codebase and /debug-files accept instead of nodes/edges
+    """
+    if not shared_cache.enabled:
+        raise HTTPException(status_code=503, detail="Graph sessions require the shared cache, send nodes/edges directly")
+    
+    body_bytes = await request.body()
+    try:
+        # Decode the (potentially large) graph with the fast JSON codec off the event loop
+        graph_id, graph, stored = await run_in_threadpool(store_graph, body_bytes)
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid graph payload: {str(e)}")
+    
+    if not stored:
+        raise HTTPException(status_code=503, detail="Failed to store graph, send nodes/edges directly")
+    
+    print(f"🗂️ Registered graph {graph_id}: {graph.node_count} nodes, {graph.edge_count} edges")
+    return {
+        "graphId": graph_id,
+        "repoUrl": graph.repo_url,
+        "totalNodes": graph.node_count,
+        "totalEdges": graph.edge_count
+    }
+
 @app.post("/debug-files")
 def debug_files(body: CodebaseQuestionBody):
     """Debug endpoint to check file detection"""
+    graph = resolve_graph(body)
     try:
-        repo_url = body.repoUrl
-        nodes = body.nodes
+        repo_url = graph.repo_url
         
         # Parse repository info
         from urllib.parse import urlparse
@@ -197,19 +388,14 @@ def debug_files(body: CodebaseQuestionBody):
         
         debug_info = {
             "repo": f"{owner}/{repo}",
-            "total_nodes": len(nodes),
+            "total_nodes": graph.node_count,
             "files_detected": [],
             "files_fetched": [],
             "errors": []
         }
         
         # Detect files
-        for node in nodes:
-            node_data = node.get('data', {})
-            node_type = node_data.get('nodeType', '')
-            node_label = node_data.get('label', '')
-            node_id = node.get('id', '')
-            
+        for node_id, node_type, node_label in graph.iter_nodes():
             common_extensions = {'.js', '.jsx', '.ts', '.tsx', '.py', '.json', '.md', '.txt', '.css', '.html'}
             has_file_extension = any(node_label.lower().endswith(ext) or node_id.lower().endswith(ext) for ext in common_extensions)
             
@@ -254,9 +440,7 @@ def debug_files(body: CodebaseQuestionBody):
 def infer_code(body: InferenceBody):
     # body.filePath must be in this format "hieunguyent12/shellhacks25/refs/heads/main/app/src/components/FlowGraph.jsx"
     try:
-        response = requests.get(baseURL + body.filePath)
-        response.raise_for_status()
-        code = response.text
+        code = fetch_file(baseURL + body.filePath).decode('utf-8', errors='replace')
 
         prompt = f"""
         Please analyze the following code file and provide a concise summary:
@@ -273,15 +457,46 @@ def infer_code(body: InferenceBody):
         Keep the response concise and informative for developers trying to understand the codebase.
         """
 
-        response = model.generate_content(prompt)
-        return {"summary": response.text}
+        return {"summary": generate_text(prompt)}
     except requests.RequestException as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch file: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate summary: {str(e)}")
 
+@app.get("/file-content")
+def file_content(filePath: str, request: Request):
+    """
+    Serve raw file content with ETag revalidation and byte Range support,
+    so clients can fetch (or re-fetch) only what they don't already have
+    """
+    try:
+        data = fetch_file(baseURL + filePath)
+    except requests.RequestException as e:
+        raise HTTPException(status_code=400, detail=f"Failed to fetch file from GitHub: {str(e)}")
+
+    etag = f'"{content_hash(data)}"'
+    cache_control = "public, max-age=300"
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+    media_type = "text/plain; charset=utf-8"
+
+    range_header = request.headers.get('range')
+    if range_header:
+        byte_range = parse_byte_range(range_header, len(data))
+        if byte_range is UNSATISFIABLE_RANGE:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{len(data)}"})
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            return Response(content=data[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+        # Malformed or multi-range requests fall through to the full response
+
+    return Response(content=data, media_type=media_type, headers=headers)
+
 @app.post("/summarize-file")
-def summarize_file(body: FileSummaryBody):
+def summarize_file(body: FileSummaryBody, request: Request):
     """
     Summarize a specific file for the file click feature
     """
@@ -290,9 +505,23 @@ def summarize_file(body: FileSummaryBody):
         full_url = baseURL + body.filePath
         
         # Fetch the file content
-        response = requests.get(full_url)
-        response.raise_for_status()
-        code = response.text
+        code = fetch_file(full_url).decode('utf-8', errors='replace')
+
+        # The summary only depends on the file content and how we describe it,
+        # so a matching ETag lets us skip the Gemini call entirely
+        file_hash = content_hash(code)
+        
+        # Skip resending file contents the client already has
+        send_content = body.includeContent and body.knownContentHash != file_hash
+        
+        # Bodies with and without fileContent differ, so they get different ETags.
+        # A client holding the full response also has everything the slim one carries.
+        full_etag = f'"{content_hash([file_hash, body.fileName, body.fileType, "full"])}"'
+        etag = full_etag if send_content else f'"{content_hash([file_hash, body.fileName, body.fileType, "slim"])}"'
+        if etag_matches(request, etag):
+            return not_modified(etag, "private, max-age=300")
+        if not send_content and etag_matches(request, full_etag):
+            return not_modified(full_etag, "private, max-age=300")
 
         # Create a focused prompt for file summarization
         prompt = f"""
@@ -316,15 +545,16 @@ def summarize_file(body: FileSummaryBody):
         """
 
         # Generate summary using Gemini
-        response = model.generate_content(prompt)
+        summary = generate_text(prompt)
         
-        return {
+        return cached_json_response({
             "fileName": body.fileName,
             "fileType": body.fileType,
-            "summary": response.text,
+            "summary": summary,
             "filePath": body.filePath,
-            "fileContent": code  # Add file contents to response
-        }
+            "fileContent": code if send_content else None,  # Add file contents to response
+            "contentHash": file_hash
+        }, etag)
         
     except requests.RequestException as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch file from GitHub: {str(e)}")
@@ -336,22 +566,21 @@ def ask_codebase(body: CodebaseQuestionBody):
     """
     Answer questions about the codebase using Gemini AI
     """
+    graph = resolve_graph(body)
     try:
         # Extract repository information
-        repo_url = body.repoUrl
-        nodes = body.nodes
-        edges = body.edges
+        repo_url = graph.repo_url
         question = body.question
         
         print(f"🤖 Codebase question received: {question}")
         print(f"📁 Repository: {repo_url}")
-        print(f"🗂️ Nodes count: {len(nodes)}")
-        print(f"🔗 Edges count: {len(edges)}")
+        print(f"🗂️ Nodes count: {graph.node_count}")
+        print(f"🔗 Edges count: {graph.edge_count}")
         
         # Build repository structure context
         structure_info = "Repository Structure:\n"
-        structure_info += f"- Total files and folders: {len(nodes)}\n"
-        structure_info += f"- Total connections: {len(edges)}\n\n"
+        structure_info += f"- Total files and folders: {graph.node_count}\n"
+        structure_info += f"- Total connections: {graph.edge_count}\n\n"
         
         # Extract repository info for comprehensive code analysis
         try:
@@ -368,17 +597,14 @@ def ask_codebase(body: CodebaseQuestionBody):
                     branch = path_parts[3]
                 
                 print(f"🔍 Analyzing repository: {owner}/{repo} (branch: {branch})")
-                print(f"📊 Total nodes to analyze: {len(nodes)}")
-                print(f"🔍 Sample node structure: {nodes[0] if nodes else 'No nodes'}")
+                print(f"📊 Total nodes to analyze: {graph.node_count}")
                 
                 # Debug: Show all node types and labels
                 print("🔍 All nodes received:")
-                for i, node in enumerate(nodes[:10]):  # Show first 10 nodes
-                    node_data = node.get('data', {})
-                    node_type = node_data.get('nodeType', 'NONE')
-                    node_label = node_data.get('label', 'NO_LABEL')
-                    node_id = node.get('id', 'NO_ID')
-                    print(f"  Node {i+1}: type='{node_type}', label='{node_label}', id='{node_id}'")
+                for i, (node_id, node_type, node_label) in enumerate(graph.iter_nodes()):
+                    if i >= 10:  # Show first 10 nodes
+                        break
+                    print(f"  Node {i+1}: type='{node_type or 'NONE'}', label='{node_label or 'NO_LABEL'}', id='{node_id or 'NO_ID'}'")
                 
                 # Initialize structure info
                 structure_info = f"Repository: {repo_url}\n"
@@ -391,13 +617,8 @@ def ask_codebase(body: CodebaseQuestionBody):
                 # Collect all files first, then prioritize them
                 all_files = []
                 
-                for file_node in nodes:
+                for node_id, node_type, node_label in graph.iter_nodes():
                     # Check multiple possible ways files might be identified
-                    node_data = file_node.get('data', {})
-                    node_type = node_data.get('nodeType', '')
-                    node_label = node_data.get('label', '')
-                    node_id = file_node.get('id', '')
-                    
                     # Debug: Print node structure for first few nodes
                     if files_found < 3:
                         print(f"🔍 Debug node {files_found + 1}: type='{node_type}', label='{node_label}', id='{node_id}'")
@@ -441,7 +662,7 @@ def ask_codebase(body: CodebaseQuestionBody):
                 print(f"🔍 Found {len(all_files)} code files to analyze")
                 
                 # If no files found but we have folders, try to fetch repository tree
-                if len(all_files) == 0 and len(nodes) > 0:
+                if len(all_files) == 0 and graph.node_count > 0:
                     print("🔄 No files detected in nodes, attempting to fetch repository tree...")
                     try:
                         additional_files = fetch_repository_tree(owner, repo, branch)
@@ -467,11 +688,14 @@ def ask_codebase(body: CodebaseQuestionBody):
                         print(f"📄 Fetching code file: {file_name}")
                         print(f"🔗 File URL: {file_url}")
                         
-                        file_response = requests.get(file_url, timeout=15)
-                        print(f"📊 Response status: {file_response.status_code}")
+                        try:
+                            content = fetch_file(file_url, timeout=15).decode('utf-8', errors='replace')
+                        except requests.HTTPError as e:
+                            content = None
+                            print(f"❌ Failed to fetch {file_name}: {e.response.status_code}")
+                            print(f"❌ Response content: {e.response.text[:200]}")
                         
-                        if file_response.status_code == 200:
-                            content = file_response.text
+                        if content is not None:
                             print(f"📄 Content preview (first 100 chars): {content[:100]}...")
                             
                             # Limit content size but keep it reasonable for analysis
@@ -492,9 +716,6 @@ def ask_codebase(body: CodebaseQuestionBody):
                             if total_files_analyzed >= 25:
                                 print("📊 Reached analysis limit (25 files)")
                                 break
-                        else:
-                            print(f"❌ Failed to fetch {file_name}: {file_response.status_code}")
-                            print(f"❌ Response content: {file_response.text[:200]}")
                     except Exception as e:
                         print(f"❌ Error fetching {file_name}: {str(e)}")
                         print(f"❌ Exception type: {type(e).__name__}")
@@ -521,12 +742,7 @@ def ask_codebase(body: CodebaseQuestionBody):
         
         # Analyze file types using the same logic as file detection
         file_types = {}
-        for node in nodes:
-            node_data = node.get('data', {})
-            node_type = node_data.get('nodeType', '')
-            node_label = node_data.get('label', '')
-            node_id = node.get('id', '')
-            
+        for node_id, node_type, node_label in graph.iter_nodes():
             # Use same file detection logic
             common_extensions = {'.js', '.jsx', '.ts', '.tsx', '.py', '.java', '.go', '.rs', '.cpp', '.c', '.cs', '.php', '.rb', '.swift', '.kt', '.scala', '.clj', '.hs', '.ml', '.fs', '.vb', '.pl', '.sh', '.bat', '.ps1', '.json', '.xml', '.yaml', '.yml', '.toml', '.ini', '.cfg', '.conf', '.md', '.txt', '.html', '.css', '.scss', '.sass', '.less', '.sql', '.r', '.m', '.mm', '.h', '.hpp', '.cc', '.cxx', '.f', '.f90', '.f95', '.pas', '.ada', '.d', '.nim', '.cr', '.ex', '.exs', '.elm', '.purs', '.res', '.rei'}
             
@@ -552,20 +768,16 @@ def ask_codebase(body: CodebaseQuestionBody):
         
         # Get top-level directories
         top_level = []
-        for node in nodes:
-            node_data = node.get('data', {})
-            node_type = node_data.get('nodeType', '')
-            node_id = node.get('id', '')
-            
+        for node_id, node_type, node_label in graph.iter_nodes():
             # Check if it's a folder (explicit or implicit)
             is_folder = (
                 node_type == 'folder' or
-                (node_type != 'file' and '.' not in node_data.get('label', '') and node_id.endswith('/')) or
-                (node_type != 'file' and '/' in node_id and not any(node_data.get('label', '').endswith(ext) for ext in ['.js', '.jsx', '.py', '.md', '.json', '.txt', '.css', '.html']))
+                (node_type != 'file' and '.' not in node_label and node_id.endswith('/')) or
+                (node_type != 'file' and '/' in node_id and not any(node_label.endswith(ext) for ext in ['.js', '.jsx', '.py', '.md', '.json', '.txt', '.css', '.html']))
             )
             
             if is_folder and ('/' not in node_id or node_id.count('/') <= 1):
-                top_level.append(node_data.get('label', node_id.split('/')[-1]))
+                top_level.append(node_label or node_id.split('/')[-1])
         
         if top_level:
             structure_info += f"\nTop-level directories: {', '.join(top_level)}\n"
@@ -600,10 +812,9 @@ Answer based on the ACTUAL CODE CONTENT:
         if not openai_client:
             print("❌ OPENAI_API_KEY not found - falling back to Gemini")
             # Fallback to Gemini if OpenAI key is not available
-            response = model.generate_content(prompt)
-            answer = response.text
+            answer = generate_text(prompt)
         else:
-            try:
+            def ask_openai():
                 response = openai_client.chat.completions.create(
                     model="gpt-4o",  # Using GPT-4o as GPT-5 is not yet available
                     messages=[
@@ -617,25 +828,29 @@ Answer based on the ACTUAL CODE CONTENT:
                         }
                     ],
                     max_tokens=1000,
-                    temperature=0.3
+                    temperature=0.3,
+                    timeout=UPSTREAM_TIMEOUT
                 )
                 
-                answer = response.choices[0].message.content
+                return response.choices[0].message.content.encode('utf-8')
+            
+            try:
+                key = f"openai:{hashlib.sha256(prompt.encode('utf-8')).hexdigest()}"
+                answer = shared_cache.get_or_compute(key, ask_openai, ttl=LLM_CACHE_TTL).decode('utf-8')
                 
             except Exception as e:
                 print(f"❌ OpenAI API error: {str(e)}")
                 print("🔄 Falling back to Gemini")
                 # Fallback to Gemini if OpenAI fails
-                response = model.generate_content(prompt)
-                answer = response.text
+                answer = generate_text(prompt)
         
         return {
             "question": question,
             "answer": answer,
             "repoUrl": repo_url,
             "context": {
-                "totalNodes": len(nodes),
-                "totalEdges": len(edges),
+                "totalNodes": graph.node_count,
+                "totalEdges": graph.edge_count,
                 "fileTypes": file_types,
                 "topLevelDirs": top_level
             }
@@ -646,7 +861,7 @@ Answer based on the ACTUAL CODE CONTENT:
         raise HTTPException(status_code=500, detail=f"Failed to analyze codebase: {str(e)}")
 
 @app.post("/synthesize-voice")
-def synthesize_voice(body: VoiceSynthesisBody):
+def synthesize_voice(body: VoiceSynthesisBody, request: Request):
     """
     Convert text to speech using ElevenLabs API
     """
@@ -655,6 +870,11 @@ def synthesize_voice(body: VoiceSynthesisBody):
             raise HTTPException(status_code=500, detail="ElevenLabs API key not configured")
         
         text = body.text
+        
+        # Same text + voice always gives an equivalent clip, so revalidation skips ElevenLabs
+        etag = f'"{content_hash([text, "Bella", str(body.raw)])}"'
+        if etag_matches(request, etag):
+            return not_modified(etag, "private, max-age=3600")
         print(f"🔊 Synthesizing voice for text: {text[:100]}...")
         
         # Use ElevenLabs to generate speech using direct API call
@@ -678,23 +898,36 @@ def synthesize_voice(body: VoiceSynthesisBody):
             }
         }
         
-        response = req.post(url, json=data, headers=headers)
-        
-        if response.status_code != 200:
-            raise Exception(f"ElevenLabs API error: {response.status_code} - {response.text}")
-        
-        audio_bytes = response.content
+        def synthesize():
+            response = req.post(url, json=data, headers=headers, timeout=UPSTREAM_TIMEOUT)
+            
+            if response.status_code != 200:
+                raise Exception(f"ElevenLabs API error: {response.status_code} - {response.text}")
+            
+            return response.content
+        
+        # Clips are cached by text, so repeated answers don't spend ElevenLabs quota
+        key = f"tts:EXAVITQu4vr4xnSDxMaL:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+        audio_bytes = shared_cache.get_or_compute(key, synthesize, ttl=TTS_CACHE_TTL)
+        
+        if body.raw:
+            print(f"✅ Voice synthesis completed: {len(audio_bytes)} bytes (raw)")
+            return Response(
+                content=audio_bytes,
+                media_type="audio/mpeg",
+                headers={"ETag": etag, "Cache-Control": "private, max-age=3600"}
+            )
         
         # Convert audio to base64 for frontend
         audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
         
         print(f"✅ Voice synthesis completed: {len(audio_bytes)} bytes")
         
-        return {
+        return cached_json_response({
             "audio_base64": audio_base64,
             "text": text,
             "voice": "Bella"
-        }
+        }, etag, "private, max-age=3600")
         
     except Exception as e:
         print(f"❌ Error in voice synthesis: {str(e)}")
@@ -0,0 +1,223 @@
+"""
+Shared on-disk cache for fetched files, LLM responses and TTS clips.
+
+Backed by SQLite in WAL mode so every worker process on the host reads and
+writes the same store. Expensive computations go through get_or_compute(),
+which holds a per-key file lock (removed again once released) so only one
+process computes a missing entry while the others wait and then read the
+stored result. Waits are bounded, and lock problems never fail the request.
+The database is capped at max_bytes by evicting the soonest-expiring rows.
+"""
+import hashlib
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # No cross-process file locks (e.g. Windows), fall back to per-process locks
+    fcntl = None
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "gitflow-cache")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+class SharedCache:
+    def __init__(self, cache_dir=None, lock_timeout=30, max_bytes=None):
+        self.cache_dir = cache_dir or os.getenv("CACHE_DIR") or DEFAULT_CACHE_DIR
+        self.db_path = os.path.join(self.cache_dir, "cache.sqlite3")
+        self.lock_dir = os.path.join(self.cache_dir, "locks")
+        self.lock_timeout = lock_timeout
+        self.max_bytes = max_bytes or int(os.getenv("CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self._local = threading.local()
+        # Per-key locks used when fcntl is unavailable: key hash -> [lock, waiter count]
+        self._thread_locks = {}
+        self._thread_locks_guard = threading.Lock()
+        self.enabled = True
+
+        try:
+            os.makedirs(self.lock_dir, exist_ok=True)
+            conn = self._connect()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+            conn.commit()
+            print(f"🗄️ Shared cache ready at: {self.db_path}")
+        except (OSError, sqlite3.Error) as e:
+            # Never take the API down because the cache is unavailable
+            print(f"❌ Shared cache disabled: {str(e)}")
+            self.enabled = False
+
+    def _connect(self):
+        # sqlite3 connections can't be shared across threads, keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """
+        Return the cached bytes for key, or None if missing/expired
+        """
+        if not self.enabled:
+            return None
+        try:
+            row = self._connect().execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"❌ Cache read failed for {key}: {str(e)}")
+            return None
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            return None
+        return bytes(value)
+
+    def set(self, key, value, ttl=None):
+        """
+        Store bytes under key, optionally expiring after ttl seconds.
+        Returns False if the value could not be stored.
+        """
+        if not self.enabled:
+            return False
+        expires_at = time.time() + ttl if ttl else None
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, sqlite3.Binary(value), expires_at)
+            )
+            # Occasionally prune expired rows instead of running a separate sweeper
+            if random.random() < 0.01:
+                conn.execute(
+                    "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?",
+                    (time.time(),)
+                )
+            self._enforce_size_limit(conn)
+        except sqlite3.Error as e:
+            print(f"❌ Cache write failed for {key}: {str(e)}")
+            return False
+        return True
+
+    def _enforce_size_limit(self, conn):
+        """
+        Evict the soonest-expiring rows (never-expiring ones last) until the
+        database's live pages fit in max_bytes
+        """
+        while True:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if (page_count - free_pages) * page_size <= self.max_bytes:
+                return
+            deleted = conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY expires_at IS NULL, expires_at LIMIT 50)"
+            ).rowcount
+            if not deleted:
+                return
+
+    def get_or_compute(self, key, compute, ttl=None):
+        """
+        Return the cached bytes for key, computing and storing them if missing.
+        Concurrent callers for the same key (in any worker) wait for a single
+        computation rather than all hitting the upstream API.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        if not self.enabled:
+            return compute()
+
+        key_hash = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        if fcntl is None:
+            return self._compute_with_thread_lock(key, key_hash, compute, ttl)
+
+        lock_path = os.path.join(self.lock_dir, key_hash + ".lock")
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                # /tmp cleaners may remove the directory while we're running
+                os.makedirs(self.lock_dir, exist_ok=True)
+                lock_file = open(lock_path, "a")
+            except OSError as e:
+                print(f"❌ Cache lock unavailable for {key}, computing without it: {str(e)}")
+                return self._compute_and_store(key, compute, ttl)
+
+            # flock is held per open file, so this also serializes threads in this process
+            with lock_file:
+                if not self._acquire_file_lock(lock_file, key, deadline):
+                    return self._compute_and_store(key, compute, ttl)
+                if not self._is_current_lock(lock_file, lock_path):
+                    # The holder removed this lock file after finishing, retry on the new one
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    continue
+                try:
+                    return self._compute_and_store(key, compute, ttl)
+                finally:
+                    # Remove the file while still holding it so lock files don't pile up
+                    try:
+                        os.unlink(lock_path)
+                    except OSError:
+                        pass
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _acquire_file_lock(self, lock_file, key, deadline):
+        """
+        Poll for the lock until the deadline; returns False if we gave up waiting
+        """
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    print(f"⏱️ Timed out waiting for cache lock on {key}, computing without it")
+                    return False
+                time.sleep(0.05)
+            except OSError as e:
+                print(f"❌ Cache lock failed for {key}, computing without it: {str(e)}")
+                return False
+
+    def _is_current_lock(self, lock_file, lock_path):
+        try:
+            held = os.fstat(lock_file.fileno())
+            current = os.stat(lock_path)
+        except OSError:
+            return False
+        return (held.st_dev, held.st_ino) == (current.st_dev, current.st_ino)
+
+    def _compute_with_thread_lock(self, key, key_hash, compute, ttl):
+        with self._thread_locks_guard:
+            entry = self._thread_locks.setdefault(key_hash, [threading.Lock(), 0])
+            entry[1] += 1
+        locked = entry[0].acquire(timeout=self.lock_timeout)
+        try:
+            return self._compute_and_store(key, compute, ttl)
+        finally:
+            if locked:
+                entry[0].release()
+            with self._thread_locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._thread_locks[key_hash]
+
+    def _compute_and_store(self, key, compute, ttl):
+        # Another worker may have filled the entry while we waited for the lock
+        value = self.get(key)
+        if value is not None:
+            return value
+        value = compute()
+        self.set(key, value, ttl)
+        return value
@@ -0,0 +1,169 @@
+"""
+Compact server-side representation of a repository graph.
+
+The frontend's React Flow nodes/edges are registered once via /register-graph
+and stored here as parallel arrays (ids, labels, interned node types and an
+int32 edge index), so question endpoints only need a short graph handle.
+"""
+import hashlib
+import json
+import struct
+from array import array
+
+# Bump whenever the to_bytes layout changes so stale cached blobs are rejected
+FORMAT_VERSION = 2
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def loads(data):
+    """
+    Decode JSON using orjson when installed, falling back to the stdlib
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(value):
+    """
+    Encode JSON to bytes using orjson when installed, falling back to the stdlib
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value).encode('utf-8')
+
+def pack_strings(values):
+    """
+    Concatenate strings as UTF-8 with an array('I') of byte lengths,
+    so ids/labels may contain any character (including NUL)
+    """
+    encoded = [value.encode('utf-8') for value in values]
+    return b"".join(encoded), array('I', (len(item) for item in encoded))
+
+def unpack_strings(blob, lengths):
+    values = []
+    offset = 0
+    for length in lengths:
+        values.append(blob[offset:offset + length].decode('utf-8'))
+        offset += length
+    return values
+
+class RepoGraph:
+    __slots__ = ("repo_url", "ids", "labels", "type_names", "type_codes", "edge_index")
+
+    def __init__(self, repo_url, ids, labels, type_names, type_codes, edge_index):
+        self.repo_url = repo_url
+        self.ids = ids                  # list of node ids (file/folder paths)
+        self.labels = labels            # list of node labels, '' when missing
+        self.type_names = type_names    # interned nodeType strings
+        self.type_codes = type_codes    # array('I') index into type_names per node
+        self.edge_index = edge_index    # array('i') of [source, target, ...], -1 if unknown
+
+    @classmethod
+    def from_lists(cls, repo_url, nodes, edges):
+        """
+        Build a graph from the raw React Flow node/edge dicts sent by the frontend
+        """
+        ids, labels = [], []
+        type_names, type_lookup = [], {}
+        type_codes = array('I')
+
+        for node in nodes:
+            node_data = node.get('data') or {}
+            node_type = node_data.get('nodeType') or ''
+            code = type_lookup.get(node_type)
+            if code is None:
+                code = type_lookup[node_type] = len(type_names)
+                type_names.append(node_type)
+            ids.append(str(node.get('id') or ''))
+            labels.append(str(node_data.get('label') or ''))
+            type_codes.append(code)
+
+        positions = {node_id: i for i, node_id in enumerate(ids)}
+        edge_index = array('i')
+        for edge in edges:
+            edge_index.append(positions.get(edge.get('source'), -1))
+            edge_index.append(positions.get(edge.get('target'), -1))
+
+        return cls(repo_url, ids, labels, type_names, type_codes, edge_index)
+
+    @property
+    def node_count(self):
+        return len(self.ids)
+
+    @property
+    def edge_count(self):
+        return len(self.edge_index) // 2
+
+    def iter_nodes(self):
+        """
+        Yield (node_id, node_type, node_label) for every node
+        """
+        type_names = self.type_names
+        for node_id, code, label in zip(self.ids, self.type_codes, self.labels):
+            yield node_id, type_names[code], label
+
+    def to_bytes(self):
+        """
+        Serialize to a compact binary blob for the shared cache
+        """
+        header = dumps({
+            "version": FORMAT_VERSION,
+            "repoUrl": self.repo_url,
+            "typeNames": self.type_names,
+            "nodeCount": self.node_count,
+            "edgeCount": self.edge_count,
+        })
+        ids, id_lengths = pack_strings(self.ids)
+        labels, label_lengths = pack_strings(self.labels)
+        return b"".join([
+            struct.pack("<III", len(header), len(ids), len(labels)),
+            header, ids, labels,
+            id_lengths.tobytes(),
+            label_lengths.tobytes(),
+            self.type_codes.tobytes(),
+            self.edge_index.tobytes(),
+        ])
+
+    @classmethod
+    def from_bytes(cls, data):
+        header_len, ids_len, labels_len = struct.unpack_from("<III", data)
+        offset = struct.calcsize("<III")
+        header = loads(data[offset:offset + header_len])
+        offset += header_len
+        if header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported graph format version: {header.get('version')}")
+        node_count = header["nodeCount"]
+
+        ids_blob = data[offset:offset + ids_len]
+        offset += ids_len
+        labels_blob = data[offset:offset + labels_len]
+        offset += labels_len
+
+        id_lengths = array('I')
+        id_lengths.frombytes(data[offset:offset + node_count * id_lengths.itemsize])
+        offset += node_count * id_lengths.itemsize
+        label_lengths = array('I')
+        label_lengths.frombytes(data[offset:offset + node_count * label_lengths.itemsize])
+        offset += node_count * label_lengths.itemsize
+
+        ids = unpack_strings(ids_blob, id_lengths)
+        labels = unpack_strings(labels_blob, label_lengths)
+
+        type_codes = array('I')
+        type_codes.frombytes(data[offset:offset + node_count * type_codes.itemsize])
+        offset += node_count * type_codes.itemsize
+
+        edge_index = array('i')
+        edge_index.frombytes(data[offset:offset + header["edgeCount"] * 2 * edge_index.itemsize])
+
+        return cls(header["repoUrl"], ids, labels, header["typeNames"], type_codes, edge_index)
+
+    @staticmethod
+    def digest(data):
+        """
+        Content hash of a serialized graph (from to_bytes), used as its session handle
+        """
+        return hashlib.sha256(data).hexdigest()[:32]
@@ -32,5 +32,25 @@ if [ -z "$GEMINI_API_KEY" ]; then
     echo ""
 fi
 
+# Shared cache location (all workers on this host read and write the same store)
+export CACHE_DIR="${CACHE_DIR:-/tmp/gitflow-cache}"
+
+if [ "$1" == "--prod" ]; then
+    # Production: multiple gunicorn-managed uvicorn workers, one per core by default
+    # Virtual environments created before production mode existed won't have gunicorn yet
+    if ! command -v gunicorn > /dev/null 2>&1; then
+        echo "📦 gunicorn not found, installing requirements..."
+        pip install -r requirements.txt || { echo "❌ Failed to install requirements (run: pip install -r server/requirements.txt)"; exit 1; }
+    fi
+
+    WORKERS="${WEB_CONCURRENCY:-$(nproc 2>/dev/null || echo 2)}"
+    echo "🏭 Production mode: $WORKERS workers, shared cache in $CACHE_DIR"
+    exec gunicorn app:app \
+        --worker-class uvicorn.workers.UvicornWorker \
+        --workers "$WORKERS" \
+        --bind 0.0.0.0:8000 \
+        --timeout 120
+fi
+
 # Start uvicorn server
 uvicorn app:app --host 0.0.0.0 --port 8000 --reload